@@ -3,9 +3,13 @@ Database Helper Functions
 
 MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
+
+The client is motor's asyncio client, so all helpers are coroutines and
+Mongo I/O never blocks the event loop (or a threadpool worker).
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
@@ -22,11 +26,11 @@ database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = AsyncIOMotorClient(database_url)
     db = _client[database_name]
 
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -40,16 +44,43 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+async def create_documents(collection_name: str, data_list: list):
+    """Insert a batch of documents with timestamps in one round-trip.
+
+    Returns one id per input document, in order. With ordered=False the
+    batch can partially succeed; documents that failed get None instead
+    of an id so callers can report them individually.
+    """
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    now = datetime.now(timezone.utc)
+    docs = []
+    for data in data_list:
+        data_dict = data.model_dump() if isinstance(data, BaseModel) else data.copy()
+        data_dict['created_at'] = now
+        data_dict['updated_at'] = now
+        docs.append(data_dict)
+
+    try:
+        result = await db[collection_name].insert_many(docs, ordered=False)
+        return [str(_id) for _id in result.inserted_ids]
+    except BulkWriteError as e:
+        # insert_many stamps _id on every doc before sending; the docs not
+        # listed in writeErrors were persisted despite the exception.
+        failed = {err['index'] for err in e.details.get('writeErrors', [])}
+        return [None if i in failed else str(doc['_id']) for i, doc in enumerate(docs)]
+
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
+
     cursor = db[collection_name].find(filter_dict or {})
     if limit:
         cursor = cursor.limit(limit)
-    
-    return list(cursor)
+
+    return await cursor.to_list(length=limit)
@@ -1,57 +1,157 @@
+import asyncio
+import hashlib
 import os
-from datetime import datetime, timedelta
+import re
+import sys
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import List, Any, Dict
 
-from fastapi import FastAPI, HTTPException
+import orjson
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+
+from database import db, create_document, create_documents, get_documents
+from schemas import TripPreference, Itinerary, ItineraryItem, ItineraryItemsSoA
+
+_JSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+
+
+def _json_default(o: Any) -> str:
+    """orjson fallback for Mongo types it can't serialize natively."""
+    if isinstance(o, ObjectId):
+        return str(o)
+    raise TypeError
+
+
+class MongoORJSONResponse(ORJSONResponse):
+    """ORJSONResponse configured for our payloads: naive UTC datetimes,
+    non-string dict keys, and ObjectId via the default hook."""
 
-from database import db, create_document, get_documents
-from schemas import TripPreference, Itinerary, ItineraryItem
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_json_default, option=_JSON_OPTS)
 
-app = FastAPI(title="Itinerix API", version="1.0.0")
+
+app = FastAPI(title="Itinerix API", version="1.0.0", default_response_class=MongoORJSONResponse)
+
+# Concrete origin allowlist (comma-separated CORS_ORIGINS) lets Starlette take
+# its static-header path; the wildcard is only a fallback when unconfigured.
+_cors_origins = [o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip()] or ["*"]
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=_cors_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type", "authorization"],
+    max_age=86400,
 )
 
 
+# Insert batching: concurrent generate requests queue their documents and a
+# single drain task flushes them with one insert_many round-trip per batch.
+_MAX_BATCH = 100
+_insert_queue: asyncio.Queue = None
+_drain_task: asyncio.Task = None
+
+
+async def _flush_batch(batch):
+    docs = [itinerary for itinerary, _ in batch]
+    try:
+        ids = await create_documents("itinerary", docs)
+    except Exception as e:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(e)
+        return
+    for (_, future), inserted_id in zip(batch, ids):
+        if future.done():
+            continue
+        if inserted_id is None:
+            # Partial bulk failure: only this document was rejected.
+            future.set_exception(Exception("Insert failed for this document"))
+        else:
+            future.set_result(inserted_id)
+
+
+async def _drain_inserts():
+    while True:
+        batch = [await _insert_queue.get()]
+        while len(batch) < _MAX_BATCH:
+            try:
+                batch.append(_insert_queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        await _flush_batch(batch)
+
+
+async def _queued_insert(itinerary: Dict[str, Any]) -> str:
+    if _insert_queue is None:
+        # Batcher not running (e.g. direct calls outside the app): insert inline.
+        return await create_document("itinerary", itinerary)
+    future = asyncio.get_event_loop().create_future()
+    _insert_queue.put_nowait((itinerary, future))
+    return await future
+
+
+@app.on_event("startup")
+async def start_insert_batcher():
+    global _insert_queue, _drain_task
+    _insert_queue = asyncio.Queue()
+    # Keep a strong reference: the loop only holds weak refs to tasks, so an
+    # unreferenced drain task could be garbage-collected mid-await.
+    _drain_task = asyncio.create_task(_drain_inserts())
+
+
+@app.on_event("shutdown")
+async def stop_insert_batcher():
+    global _insert_queue, _drain_task
+    queue, _insert_queue = _insert_queue, None  # late requests insert inline
+    if _drain_task is not None:
+        _drain_task.cancel()
+        _drain_task = None
+    # Flush anything still queued so in-flight requests aren't dropped.
+    pending = []
+    while queue is not None and not queue.empty():
+        pending.append(queue.get_nowait())
+    if pending:
+        await _flush_batch(pending)
+
+
+@app.on_event("startup")
+async def ensure_indexes():
+    # Index-backed sort for list_itineraries; without it Mongo does a
+    # collection scan + in-memory sort that grows with history size.
+    if db is not None:
+        await db["itinerary"].create_index([("created_at", -1)], background=True)
+
+
 # -------------------------------
 # Utilities
 # -------------------------------
 
-def serialize_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
-    if not doc:
-        return doc
-    d = dict(doc)
-    if "_id" in d:
-        d["id"] = str(d.pop("_id"))
-    # Convert datetimes to ISO strings
-    for k, v in list(d.items()):
-        if isinstance(v, datetime):
-            d[k] = v.isoformat()
-    # Nested conversions
-    def convert_nested(x):
-        if isinstance(x, list):
-            return [convert_nested(i) for i in x]
-        if isinstance(x, dict):
-            return {k: convert_nested(v) for k, v in x.items()}
-        if isinstance(x, datetime):
-            return x.isoformat()
-        return x
-    return convert_nested(d)
+def json_response(payload: Any, headers: Dict[str, str] = None) -> Response:
+    """Serialize a payload of Mongo documents to JSON in one native pass.
+
+    orjson walks the structure and formats datetimes in C; only ObjectId
+    needs the Python fallback. Callers rename ``_id`` to ``id`` first.
+    """
+    body = orjson.dumps(payload, default=_json_default, option=_JSON_OPTS)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 def date_diff_days(start: str, end: str) -> int:
+    # Dates are fixed-format YYYY-MM-DD; slicing skips strptime's
+    # locale-aware regex machinery on every request.
     try:
-        sd = datetime.strptime(start, "%Y-%m-%d")
-        ed = datetime.strptime(end, "%Y-%m-%d")
-        delta = (ed - sd).days + 1
-        return max(1, delta)
+        sd = date(int(start[:4]), int(start[5:7]), int(start[8:10]))
+        ed = date(int(end[:4]), int(end[5:7]), int(end[8:10]))
+        return max(1, (ed - sd).days + 1)
     except Exception:
         return 3  # sensible default
 
@@ -60,84 +160,147 @@ def date_diff_days(start: str, end: str) -> int:
 # Simple AI-inspired generator
 # -------------------------------
 
+# One compiled regex scan replaces ~20 substring probes per call; the matched
+# named group selects the emoji.
+_EMOJI_RE = re.compile(
+    r"(?P<map>paris|rome|florence|milan)"
+    r"|(?P<mtn>tokyo|kyoto|osaka|japan)"
+    r"|(?P<beach>beach|bali|maldives|honolulu|miami)"
+    r"|(?P<city>new york|nyc|los angeles|\bla\b|london)",
+    re.IGNORECASE,
+)
+_EMOJI = {"map": "🗺️", "mtn": "🗻", "beach": "🏝️", "city": "🏙️"}
+
+
 def pick_emoji(destination: str) -> str:
-    name = destination.lower()
-    if any(k in name for k in ["paris", "rome", "florence", "milan"]):
-        return "🗺️"
-    if any(k in name for k in ["tokyo", "kyoto", "osaka", "japan"]):
-        return "🗻"
-    if any(k in name for k in ["beach", "bali", "maldives", "honolulu", "miami"]):
-        return "🏝️"
-    if any(k in name for k in ["new york", "nyc", "los angeles", "la", "london"]):
-        return "🏙️"
-    return "✈️"
+    m = _EMOJI_RE.search(destination)
+    return _EMOJI[m.lastgroup] if m else "✈️"
+
+
+# Static lookup tables for the generator, built once at import instead of on
+# every generate_daily_plan call.
+_INTEREST_MAP = {
+    "food": ("food", ["morning", "evening"]),
+    "museums": ("culture", ["afternoon"]),
+    "art": ("culture", ["afternoon", "evening"]),
+    "nature": ("adventure", ["morning", "afternoon"]),
+    "shopping": ("shopping", ["afternoon", "evening"]),
+    "nightlife": ("nightlife", ["evening"]),
+    "relax": ("relaxation", ["morning", "afternoon"]),
+    "history": ("culture", ["morning"]),
+}
+
+_DEFAULT_INTEREST = ("sightseeing", ["morning", "afternoon", "evening"])
+
+_PACE_COUNT = {"relaxed": 2, "balanced": 3, "packed": 4}
+
+_TITLES = {
+    "sightseeing": "Iconic Landmark Walk",
+    "food": "Local Bites & Street Food",
+    "culture": "Museum or Cultural Spot",
+    "adventure": "Outdoor Adventure",
+    "relaxation": "Slow Stroll & Cafe",
+    "shopping": "Design + Boutique Crawl",
+    "nightlife": "Evening Bars & Live Music",
+    "transport": "Transfer/Check-in",
+}
+
+# Intern the category/time literals so the hot dict lookups hash and compare
+# by pointer, and preformat each category's description prefix so per-call
+# work is a single concatenation instead of f-string formatting.
+_INTEREST_MAP = {
+    key: (sys.intern(cat), [sys.intern(t) for t in times])
+    for key, (cat, times) in _INTEREST_MAP.items()
+}
+_DEFAULT_INTEREST = (
+    sys.intern(_DEFAULT_INTEREST[0]),
+    [sys.intern(t) for t in _DEFAULT_INTEREST[1]],
+)
+_TITLES = {sys.intern(cat): title for cat, title in _TITLES.items()}
 
+_DESC_PREFIX = {cat: "Curated " + cat + " stop aligned with your mood: " for cat in _TITLES}
 
-def generate_daily_plan(day_idx: int, prefs: TripPreference) -> List[ItineraryItem]:
-    buckets = []
-    interest_map = {
-        "food": ("food", ["morning", "evening"]),
-        "museums": ("culture", ["afternoon"]),
-        "art": ("culture", ["afternoon", "evening"]),
-        "nature": ("adventure", ["morning", "afternoon"]),
-        "shopping": ("shopping", ["afternoon", "evening"]),
-        "nightlife": ("nightlife", ["evening"]),
-        "relax": ("relaxation", ["morning", "afternoon"]),
-        "history": ("culture", ["morning"]),
-    }
 
-    pace_to_count = {"relaxed": 2, "balanced": 3, "packed": 4}
-    count = pace_to_count.get(prefs.pace, 3)
+def _plan_slots(prefs: TripPreference) -> List[tuple]:
+    """Resolve the (category, time_of_day, title, description) slots for one day.
+
+    The slots depend only on the preferences, not the day number, so they
+    are computed once per generation and reused for every day.
+    """
+    interest_get = _INTEREST_MAP.get
+    count = _PACE_COUNT.get(prefs.pace, 3)
 
-    chosen = []
+    # Loop-invariant pieces: join the mood list once and format each
+    # category's description at most once.
+    mood_str = ", ".join(prefs.mood) or "explore"
+    desc_by_cat: Dict[str, str] = {}
+
+    slots = []
     for i in range(count):
         # Cycle through interests to diversify
         key = prefs.interests[i % max(1, len(prefs.interests))].lower() if prefs.interests else "sightseeing"
-        cat, times = interest_map.get(key, ("sightseeing", ["morning", "afternoon", "evening"]))
+        cat, times = interest_get(key, _DEFAULT_INTEREST)
         tod = times[i % len(times)]
-        title = {
-            "sightseeing": "Iconic Landmark Walk",
-            "food": "Local Bites & Street Food",
-            "culture": "Museum or Cultural Spot",
-            "adventure": "Outdoor Adventure",
-            "relaxation": "Slow Stroll & Cafe",
-            "shopping": "Design + Boutique Crawl",
-            "nightlife": "Evening Bars & Live Music",
-            "transport": "Transfer/Check-in",
-        }[cat]
-        desc = f"Curated {cat} stop aligned with your mood: {', '.join(prefs.mood) or 'explore'}."
-        chosen.append(ItineraryItem(day=day_idx, title=title, description=desc, category=cat, time_of_day=tod))
-    return chosen
+        desc = desc_by_cat.get(cat)
+        if desc is None:
+            desc = desc_by_cat[cat] = _DESC_PREFIX[cat] + mood_str + "."
+        slots.append((cat, tod, _TITLES[cat], desc))
+    return slots
+
+
+def generate_daily_plan(day_idx: int, prefs: TripPreference) -> List[ItineraryItem]:
+    # Values are trusted literals from the tables above; model_construct
+    # skips validation. All fields are passed since it applies no defaults.
+    return [
+        ItineraryItem.model_construct(
+            day=day_idx,
+            title=title,
+            description=desc,
+            category=cat,
+            time_of_day=tod,
+            location=None,
+            cost_estimate=None,
+        )
+        for cat, tod, title, desc in _plan_slots(prefs)
+    ]
 
 
 def generate_itinerary(prefs: TripPreference) -> Itinerary:
     days = date_diff_days(prefs.start_date, prefs.end_date)
-    items: List[ItineraryItem] = []
-
-    # Arrival and departure helpers
-    items.append(
-        ItineraryItem(
-            day=1,
-            title="Arrival & Check-in",
-            description="Settle in and take a gentle neighborhood walk.",
-            category="transport",
-            time_of_day="morning",
-        )
-    )
 
+    # Items are built columnar (structure-of-arrays): appending primitives to
+    # parallel lists instead of constructing a model object per item.
+    day_col: List[int] = [1]
+    title_col: List[str] = ["Arrival & Check-in"]
+    desc_col: List[str] = ["Settle in and take a gentle neighborhood walk."]
+    cat_col: List[str] = ["transport"]
+    time_col: List[str] = ["morning"]
+
+    # One fused loop over days * slots instead of a generate_daily_plan call
+    # (and slot re-resolution) per day.
+    slots = _plan_slots(prefs)
     for d in range(1, days + 1):
-        items.extend(generate_daily_plan(d, prefs))
+        for cat, tod, title, desc in slots:
+            day_col.append(d)
+            title_col.append(title)
+            desc_col.append(desc)
+            cat_col.append(cat)
+            time_col.append(tod)
 
     if days > 2:
-        items.append(
-            ItineraryItem(
-                day=days,
-                title="Farewell Dinner",
-                description="Wrap up the trip with a memorable final meal.",
-                category="food",
-                time_of_day="evening",
-            )
-        )
+        day_col.append(days)
+        title_col.append("Farewell Dinner")
+        desc_col.append("Wrap up the trip with a memorable final meal.")
+        cat_col.append("food")
+        time_col.append("evening")
+
+    items_soa = ItineraryItemsSoA.model_construct(
+        days=day_col,
+        titles=title_col,
+        descriptions=desc_col,
+        categories=cat_col,
+        times=time_col,
+    )
 
     name = f"{prefs.destination}: {days} days"
     summary = (
@@ -145,15 +308,33 @@ def generate_itinerary(prefs: TripPreference) -> Itinerary:
         f"optimized for a {prefs.pace} pace with a {prefs.budget_level} budget."
     )
 
-    return Itinerary(
+    return Itinerary.model_construct(
         name=name,
         preference=prefs,
-        items=items,
+        items=[],
+        items_soa=items_soa,
         summary=summary,
         destination_emoji=pick_emoji(prefs.destination),
     )
 
 
+@lru_cache(maxsize=2048)
+def _generate_cached(prefs_json: str, aos: bool = False) -> str:
+    """Memoized generation: deterministic for identical preferences.
+
+    Keyed by the serialized preference since Pydantic models aren't
+    hashable; returns the itinerary as a JSON string. Pure function, so
+    no invalidation is needed. ``aos`` expands the columnar items into
+    the classic array-of-objects view for older clients.
+    """
+    prefs = TripPreference.model_validate_json(prefs_json)
+    itinerary = generate_itinerary(prefs)
+    if aos:
+        itinerary.items = itinerary.items_soa.to_items()
+        itinerary.items_soa = None
+    return itinerary.model_dump_json()
+
+
 # -------------------------------
 # API Routes
 # -------------------------------
@@ -168,52 +349,104 @@ def hello():
     return {"message": "Hello from Itinerix backend!"}
 
 
-class GenerateResponse(BaseModel):
-    id: str
-    itinerary: Dict[str, Any]
-
-
-@app.post("/api/itineraries/generate", response_model=GenerateResponse)
-def generate_route(prefs: TripPreference):
+@app.post("/api/itineraries/generate")
+async def generate_route(prefs: TripPreference, aos: bool = False):
     try:
-        itinerary = generate_itinerary(prefs)
-        inserted_id = create_document("itinerary", itinerary)
-
-        # Fetch saved doc to return consistent payload
-        saved = db["itinerary"].find_one({"_id": db["itinerary"].inserted_id}) if False else None
-        # If not re-querying, serialize from model
-        payload = itinerary.model_dump()
-        payload["created_at"] = datetime.utcnow().isoformat()
-        return {"id": inserted_id, "itinerary": payload}
+        prefs_json = prefs.model_dump_json()
+        soa_json = _generate_cached(prefs_json)
+        # Always persist the canonical SoA document; aos only changes how the
+        # response body is rendered, never the stored shape.
+        inserted_id = await _queued_insert(orjson.loads(soa_json))
+        itinerary_json = _generate_cached(prefs_json, True) if aos else soa_json
+
+        # Single Rust-side serialization pass via model_dump_json (cached),
+        # spliced as raw bytes; no intermediate dict, no jsonable_encoder.
+        body = b'{"id":%b,"itinerary":%b,"created_at":"%b"}' % (
+            orjson.dumps(inserted_id),
+            itinerary_json.encode(),
+            datetime.utcnow().isoformat().encode(),
+        )
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# List view only needs summary fields; projecting them cuts wire bytes and
+# BSON decode cost per document.
+_LIST_PROJECTION = {
+    "name": 1,
+    "destination_emoji": 1,
+    "summary": 1,
+    "created_at": 1,
+    "preference.destination": 1,
+}
+
+
 @app.get("/api/itineraries")
-def list_itineraries():
+async def list_itineraries(request: Request, full: bool = False):
     try:
-        cursor = db["itinerary"].find({}).sort("created_at", -1).limit(10)
-        docs = [serialize_doc(d) for d in cursor]
-        return {"items": docs}
+        # Cheap conditional-GET check first: the list only changes when a
+        # newer document appears, so its ETag derives from the newest _id.
+        newest = await (
+            db["itinerary"].find({}, {"_id": 1}).sort("created_at", -1).limit(1).to_list(length=1)
+        )
+        tag_src = f"{newest[0]['_id'] if newest else 'empty'}:{full}"
+        etag = '"' + hashlib.md5(tag_src.encode()).hexdigest() + '"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        projection = None if full else _LIST_PROJECTION
+        cursor = db["itinerary"].find({}, projection).sort("created_at", -1).limit(10)
+        docs = await cursor.to_list(length=10)
+        for d in docs:
+            d["id"] = str(d.pop("_id"))
+        return json_response({"items": docs}, headers={"ETag": etag})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/itineraries/{itinerary_id}")
-def get_itinerary(itinerary_id: str):
-    from bson import ObjectId
-
+async def get_itinerary(itinerary_id: str, request: Request):
+    # Malformed ids can never match a document; reject them before the
+    # ObjectId constructor raises or a Mongo round-trip happens.
+    if not ObjectId.is_valid(itinerary_id):
+        raise HTTPException(status_code=404, detail="Itinerary not found")
+    # Documents are immutable once inserted, so the id itself is a valid
+    # strong ETag; a match skips the Mongo lookup and the response body.
+    etag = f'"{itinerary_id}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    if db is None:
+        # The app runs without a configured database (see database.py);
+        # report that cleanly instead of letting a TypeError escape.
+        raise HTTPException(
+            status_code=500,
+            detail="Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.",
+        )
     try:
-        doc = db["itinerary"].find_one({"_id": ObjectId(itinerary_id)})
-        if not doc:
-            raise HTTPException(status_code=404, detail="Itinerary not found")
-        return serialize_doc(doc)
-    except Exception as e:
+        doc = await db["itinerary"].find_one({"_id": ObjectId(itinerary_id)})
+    except PyMongoError as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not doc:
+        raise HTTPException(status_code=404, detail="Itinerary not found")
+    doc["id"] = str(doc.pop("_id"))
+    return json_response(doc, headers={"ETag": etag})
+
+
+# /test doubles as a healthcheck; cache the snapshot so polling doesn't issue
+# a Mongo listCollections round-trip per hit.
+_HEALTH_TTL = 30.0
+_health_snapshot = None  # (expires_at, response)
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
+    global _health_snapshot
+
+    now = time.monotonic()
+    if _health_snapshot is not None and now < _health_snapshot[0]:
+        return _health_snapshot[1]
+
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -230,7 +463,7 @@ def test_database():
             response["database_name"] = db.name if hasattr(db, "name") else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -243,6 +476,7 @@ def test_database():
     response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
     response["database_name"] = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
 
+    _health_snapshot = (now + _HEALTH_TTL, response)
     return response
 
 
@@ -250,4 +484,12 @@ if __name__ == "__main__":
     import uvicorn
 
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 2)),
+        access_log=False,
+    )
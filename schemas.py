@@ -55,6 +55,36 @@ class ItineraryItem(BaseModel):
     location: Optional[str] = None
     cost_estimate: Optional[float] = Field(None, ge=0)
 
+class ItineraryItemsSoA(BaseModel):
+    """Columnar (structure-of-arrays) itinerary items.
+
+    Parallel lists indexed by item: position i across all columns is one
+    activity. Lists of primitives are cheap to build and serialize; the
+    classic array-of-objects view is available via to_items().
+    """
+    days: List[int] = Field(default_factory=list)
+    titles: List[str] = Field(default_factory=list)
+    descriptions: List[str] = Field(default_factory=list)
+    categories: List[str] = Field(default_factory=list)
+    times: List[str] = Field(default_factory=list)
+
+    def to_items(self) -> List[ItineraryItem]:
+        """Expand to the array-of-objects view for compatibility."""
+        return [
+            ItineraryItem.model_construct(
+                day=day,
+                title=title,
+                description=desc,
+                category=cat,
+                time_of_day=tod,
+                location=None,
+                cost_estimate=None,
+            )
+            for day, title, desc, cat, tod in zip(
+                self.days, self.titles, self.descriptions, self.categories, self.times
+            )
+        ]
+
 class Itinerary(BaseModel):
     """Generated itinerary document.
     Collection name: "itinerary"
@@ -62,6 +92,9 @@ class Itinerary(BaseModel):
     name: str = Field(..., description="Human-friendly title for this itinerary")
     preference: TripPreference
     items: List[ItineraryItem] = Field(default_factory=list)
+    items_soa: Optional[ItineraryItemsSoA] = Field(
+        None, description="Columnar items; populated instead of items by the generator"
+    )
     summary: Optional[str] = Field(None, description="Short overview of the trip")
     destination_emoji: Optional[str] = None
 
@@ -0,0 +1,32 @@
+"""
+Optional AOT build for the hot generator path.
+
+The itinerary generator is pure Python control flow, so compiling it to a
+C extension removes bytecode-dispatch overhead. Build with:
+
+    pip install cython && python setup.py build_ext --inplace
+
+This is strictly optional: without the build step (or without Cython
+installed) the plain .py modules run unchanged.
+"""
+
+from setuptools import setup
+
+try:
+    from Cython.Build import cythonize
+
+    # Pure-Python mode: the sources stay importable as-is; the compiled
+    # .so simply shadows them when present.
+    ext_modules = cythonize(
+        ["main.py", "schemas.py", "database.py"],
+        language_level=3,
+    )
+except ImportError:
+    ext_modules = []
+
+setup(
+    name="itinerix-backend",
+    version="1.0.0",
+    py_modules=["main", "schemas", "database", "schema_examples"],
+    ext_modules=ext_modules,
+)